@@ -0,0 +1,177 @@
+"""
+Dynamic micro-batching for single-sentence predictions
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class DynamicBatcher:
+    """
+    Coalesces concurrent single-sentence requests into one batched model call.
+
+    Requests are queued together with a future. A single background worker drains
+    up to ``max_batch_size`` items, waiting at most ``max_wait_ms`` after the first
+    item arrives, runs them through ``predict_fn`` in one call and resolves each
+    future with its own result. Up to ``max_inflight`` batches run at once, so the
+    next batch can be tokenized and copied while the previous one computes.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[List[str]], List[Dict[str, any]]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_inflight: int = 1,
+    ):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_inflight = max_inflight
+        self.queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Semaphore] = None
+        self._batches: Set[asyncio.Task] = set()
+        # Dedicated threads: compiled CUDA graphs are recorded per thread, so keep the set small and fixed
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def start(self):
+        """Create the queue and spawn the background worker on the running loop"""
+        self.queue = asyncio.Queue()
+        self._inflight = asyncio.Semaphore(self.max_inflight)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_inflight, thread_name_prefix="batcher")
+        self._worker = asyncio.create_task(self._batch_worker())
+        logger.info(
+            f"Dynamic batcher started (max_batch_size={self.max_batch_size}, max_wait={self.max_wait * 1000:.1f}ms, "
+            f"max_inflight={self.max_inflight})"
+        )
+
+    async def stop(self):
+        """Cancel the background worker and in-flight batches, and fail any requests still queued"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        for batch in list(self._batches):
+            batch.cancel()
+        await asyncio.gather(*self._batches, return_exceptions=True)
+
+        while self.queue is not None and not self.queue.empty():
+            _, future = self.queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batcher stopped"))
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def run(self, fn: Callable, *args):
+        """Run a blocking call on the executor threads, e.g. a whole-batch request that skips the queue"""
+        if not self.is_running:
+            raise RuntimeError("Batcher not running")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def run_on_each_thread(self, fn: Callable[[], None]):
+        """
+        Run fn once on every executor thread, one thread at a time, e.g. to warm up per-thread state
+        such as compiled CUDA graphs before the first batch. Call after start().
+        """
+        loop = asyncio.get_running_loop()
+        # Every task holds its thread at the barrier, so each one lands on a different thread
+        barrier = threading.Barrier(self.max_inflight)
+        lock = threading.Lock()
+
+        def run():
+            barrier.wait()
+            with lock:
+                fn()
+
+        await asyncio.gather(*(loop.run_in_executor(self._executor, run) for _ in range(self.max_inflight)))
+
+    @property
+    def is_running(self) -> bool:
+        """Check if the background worker is alive"""
+        return self._worker is not None and not self._worker.done()
+
+    async def predict(self, sentence: str) -> Dict[str, any]:
+        """
+        Queue a sentence for the next batch and wait for its prediction
+
+        Args:
+            sentence: Clinical text to classify
+
+        Returns:
+            Dictionary with 'label' and 'score'
+        """
+        if not self.is_running:
+            raise RuntimeError("Batcher not running")
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((sentence, future))
+        return await future
+
+    async def _collect_batch(self) -> List[Tuple[str, asyncio.Future]]:
+        """Block for the first item, then gather more until the batch is full or the window closes"""
+        loop = asyncio.get_running_loop()
+        items = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(items) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(self.queue.get(), timeout=timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return items
+
+    async def _batch_worker(self):
+        """Collect batches and hand them off until cancelled, keeping at most max_inflight running"""
+        while True:
+            # Wait for a free slot first so requests keep accumulating into the next batch meanwhile
+            await self._inflight.acquire()
+            try:
+                items = await self._collect_batch()
+            except asyncio.CancelledError:
+                self._inflight.release()
+                raise
+
+            batch = asyncio.create_task(self._run_batch(items))
+            self._batches.add(batch)
+            batch.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, items: List[Tuple[str, asyncio.Future]]):
+        """Run one batch through the model and resolve its futures"""
+        loop = asyncio.get_running_loop()
+        sentences = [sentence for sentence, _ in items]
+
+        try:
+            # Model call is blocking, keep it off the event loop
+            results = await loop.run_in_executor(self._executor, self.predict_fn, sentences)
+        except asyncio.CancelledError:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(RuntimeError("Batcher stopped"))
+            raise
+        except Exception as e:
+            logger.error(f"Batched prediction error: {e}")
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._inflight.release()
+
+        for (_, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
@@ -3,8 +3,12 @@ FastAPI application for clinical assertion classification
 """
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
+import asyncio
 import logging
+import os
+import random
 import time
 
 from app.schemas import (
@@ -15,23 +19,63 @@ from app.schemas import (
     HealthResponse,
 )
 from app.model import get_model
+from app.batching import DynamicBatcher
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Request timings are logged for slow requests and for a random sample of the rest
+SLOW_REQUEST_US = int(float(os.getenv("SLOW_REQUEST_MS", "100")) * 1000)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+
+def log_timing(elapsed_us: int, message: str, *args):
+    """Log a request timing if it was slow or falls in the sample; the message is only formatted when logged"""
+    if elapsed_us > SLOW_REQUEST_US:
+        logger.warning("Slow request: " + message + " in %.2fms", *args, elapsed_us / 1000)
+    elif random.random() < LOG_SAMPLE_RATE and logger.isEnabledFor(logging.INFO):
+        logger.info(message + " in %.2fms", *args, elapsed_us / 1000)
+
+
+async def run_model(fn, *args):
+    """Run a blocking model call off the event loop, on the batcher's warmed-up threads when it is running"""
+    batcher = getattr(app.state, "batcher", None)
+    if batcher is not None and batcher.is_running:
+        return await batcher.run(fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Load model on startup"""
     logger.info("Loading model during startup...")
     try:
-        get_model()  # Load model into cache
+        model = get_model()  # Load model into cache
         logger.info("Model loaded successfully")
     except Exception as e:
         logger.error(f"Failed to load model during startup: {e}")
         raise
+
+    # Coalesce concurrent /predict requests into batched forward passes
+    app.state.batcher = DynamicBatcher(
+        model.predict_batch,
+        max_batch_size=int(os.getenv("BATCH_MAX_SIZE", "32")),
+        max_wait_ms=float(os.getenv("BATCH_MAX_WAIT_MS", "5")),
+        max_inflight=model.max_concurrency,
+    )
+    await app.state.batcher.start()
+
+    try:
+        # Trigger compilation before the first request, on the threads that will serve it
+        await app.state.batcher.run_on_each_thread(model.warmup)
+        logger.info("Model warmup completed")
+    except Exception as e:
+        logger.error(f"Model warmup failed during startup: {e}")
+        await app.state.batcher.stop()
+        raise
     yield
+    await app.state.batcher.stop()
 
 
 # Initialize FastAPI app
@@ -40,16 +84,18 @@ app = FastAPI(
     description="API for classifying assertion status (PRESENT, ABSENT, CONDITIONAL) in clinical text",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# CORS middleware runs on every request; only add it when browser clients need it
+if os.getenv("ENABLE_CORS", "0") == "1":
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
 
 
 @app.get("/", tags=["Root"])
@@ -69,7 +115,9 @@ async def health_check():
         return HealthResponse(status="unhealthy", model_loaded=False, model_name="N/A")
 
 
-@app.post("/predict", response_model=PredictionResponse, tags=["Prediction"])
+# Prediction routes return ORJSONResponse directly, skipping response_model validation on the hot path;
+# the schemas are still declared for the OpenAPI docs
+@app.post("/predict", response_model=None, responses={200: {"model": PredictionResponse}}, tags=["Prediction"])
 async def predict(request: PredictionRequest):
     """
     Predict assertion status for a single clinical sentence
@@ -81,23 +129,26 @@ async def predict(request: PredictionRequest):
         PredictionResponse with label and confidence score
     """
     try:
-        start_time = time.time()
+        start = time.perf_counter_ns()
 
-        # Get model and make prediction
-        model = get_model()
-        result = model.predict(request.sentence)
+        # Route through the dynamic batcher when running, otherwise predict directly
+        batcher = getattr(app.state, "batcher", None)
+        if batcher is not None and batcher.is_running:
+            result = await batcher.predict(request.sentence)
+        else:
+            model = get_model()
+            result = await run_model(model.predict, request.sentence)
 
-        elapsed_time = (time.time() - start_time) * 1000
-        logger.info(f"Prediction completed in {elapsed_time:.2f}ms")
+        log_timing((time.perf_counter_ns() - start) // 1000, "Prediction completed")
 
-        return PredictionResponse(**result)
+        return ORJSONResponse(result)
 
     except Exception as e:
         logger.error(f"Prediction error: {e}")
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
 
-@app.post("/predict/batch", response_model=BatchPredictionResponse, tags=["Prediction"])
+@app.post("/predict/batch", response_model=None, responses={200: {"model": BatchPredictionResponse}}, tags=["Prediction"])
 async def predict_batch(request: BatchPredictionRequest):
     """
     Predict assertion status for multiple clinical sentences
@@ -109,17 +160,16 @@ async def predict_batch(request: BatchPredictionRequest):
         BatchPredictionResponse with list of predictions
     """
     try:
-        start_time = time.time()
+        start = time.perf_counter_ns()
 
         # Get model and make batch prediction
         model = get_model()
-        results = model.predict_batch(request.sentences)
+        results = await run_model(model.predict_batch, request.sentences)
 
-        elapsed_time = (time.time() - start_time) * 1000
-        logger.info(f"Batch prediction for {len(request.sentences)} sentences completed in {elapsed_time:.2f}ms")
+        elapsed_us = (time.perf_counter_ns() - start) // 1000
+        log_timing(elapsed_us, "Batch prediction for %d sentences completed", len(request.sentences))
 
-        predictions = [PredictionResponse(**result) for result in results]
-        return BatchPredictionResponse(predictions=predictions)
+        return ORJSONResponse({"predictions": results})
 
     except Exception as e:
         logger.error(f"Batch prediction error: {e}")
@@ -129,4 +179,17 @@ async def predict_batch(request: BatchPredictionRequest):
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8080)
+    workers = int(os.getenv("WEB_WORKERS", "1"))
+    if workers > 1 and "TORCH_NUM_THREADS" not in os.environ:
+        # Split the cores between workers instead of every worker using all of them
+        os.environ["TORCH_NUM_THREADS"] = str(max(1, (os.cpu_count() or 1) // workers))
+
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8080")),
+        loop="uvloop",
+        http="httptools",
+        workers=workers,
+        log_level="warning",
+    )
@@ -1,14 +1,31 @@
 """
 Model loading and prediction logic
 """
+import contextlib
+import hashlib
+import itertools
 import logging
-from typing import Dict, List
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Union
+from safetensors import SafetensorError
+from safetensors.torch import load_file, save_file
+from transformers import AutoConfig, AutoTokenizer, AutoModelForSequenceClassification
 import torch
+import torch.nn.functional as F
+from torch._dynamo.exc import BackendCompilerFailed, TorchDynamoException
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Backend flags for inference-only serving
+torch.backends.cudnn.benchmark = True
+torch.backends.mkldnn.enabled = True
+
 
 class ClinicalAssertionModel:
     """
@@ -17,27 +34,365 @@ class ClinicalAssertionModel:
     """
 
     MODEL_NAME = "bvanaken/clinical-assertion-negation-bert"
+    MAX_LENGTH = 512
+    # Fixed padded sequence lengths so compiled graphs are reused across requests
+    SEQ_BUCKETS = (32, 64, 128, 256, 512)
+    # Narrow dtypes for GPU inputs: ids fit in int32 and the mask is binary, so the H2D copy shrinks 2-8x
+    GPU_INPUT_DTYPES = {"input_ids": torch.int32, "token_type_ids": torch.int32, "attention_mask": torch.uint8}
+    # Compute streams, so one batch's H2D copy and kernels can overlap another's
+    CUDA_STREAMS = 2
 
     def __init__(self):
         """Initialize and load the model and tokenizer"""
         self.model = None
         self.tokenizer = None
+        self._id2label = ()
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        # Side stream for host-to-device input copies
+        self._h2d_stream = torch.cuda.Stream() if self.device == "cuda" else None
+        self._compute_streams = [torch.cuda.Stream() for _ in range(self.CUDA_STREAMS)] if self.device == "cuda" else []
+        self._compute_stream_cycle = itertools.cycle(self._compute_streams)
+        self._compute_stream_lock = threading.Lock()
+        # bucket -> (graph, static inputs, static logits) for single-sentence replay
+        self._cuda_graphs = {}
+        self._cuda_graph_lock = threading.Lock()
+        # LRU cache of sentence digest -> prediction; 0 disables caching
+        self.cache_size = int(os.getenv("CLINICAL_CACHE_SIZE", "8192"))
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Half precision on GPU; BF16 autocast on CPU is opt-in since it only pays off on CPUs with native BF16
+        self.dtype = torch.float16 if self.device == "cuda" else torch.bfloat16
+        self.use_autocast = self.device == "cuda" or os.getenv("CLINICAL_CPU_BF16", "0") == "1"
+        # INT8 is opt-in: its per-tensor activation scales cover padding and the other rows of the batch,
+        # so a score would depend on which requests shared its batch
+        self.quantize = self.device == "cpu" and os.getenv("CLINICAL_QUANTIZE", "0") == "1"
+        if self.quantize:
+            # INT8 kernels replace the BF16 path on CPU
+            self.use_autocast = False
+        self.backend = os.getenv("CLINICAL_BACKEND", "torch")
+        if self.backend == "onnx" and self.device != "cpu":
+            logger.warning("ONNX Runtime backend is only used for CPU serving, falling back to torch")
+            self.backend = "torch"
+        # Weights staged in shared memory so every worker process maps the same pages; "" disables.
+        # On by default only for several workers serving the FP32 torch model on CPU: quantization and
+        # .to("cuda") copy the weights out of the mapping, and tmpfs counts against the memory limit
+        weights_name = f"{self.MODEL_NAME.strip('/').replace('/', '--')}-{'fp16' if self.device == 'cuda' else 'fp32'}"
+        shared = (
+            int(os.getenv("WEB_WORKERS", "1")) > 1
+            and self.device == "cpu"
+            and not self.quantize
+            and self.backend == "torch"
+            and os.path.isdir("/dev/shm")
+        )
+        self.shm_weights_path = os.getenv("CLINICAL_SHM_WEIGHTS", f"/dev/shm/{weights_name}.safetensors" if shared else "")
         self.load_model()
 
     def load_model(self):
         """Load the pre-trained model and tokenizer"""
         try:
             logger.info(f"Loading model {self.MODEL_NAME}...")
-            self.tokenizer = AutoTokenizer.from_pretrained(self.MODEL_NAME)
-            self.model = AutoModelForSequenceClassification.from_pretrained(self.MODEL_NAME)
-            self.model.to(self.device)
-            self.model.eval()
-            logger.info(f"Model loaded successfully on device: {self.device}")
+            self.clear_cache()
+            self.tokenizer = AutoTokenizer.from_pretrained(self.MODEL_NAME, use_fast=True)
+            if self.backend == "onnx":
+                self.model = self._load_onnx_model()
+            else:
+                self._load_torch_model()
+            # Class index -> label as a tuple, so the hot path does a plain index instead of a config dict lookup
+            id2label = self.model.config.id2label
+            self._id2label = tuple(id2label[i] for i in range(len(id2label)))
+            logger.info(f"Model loaded successfully on device: {self.device} (backend: {self.backend})")
         except Exception as e:
             logger.error(f"Failed to load model: {e}")
             raise
 
+    def _load_torch_model(self):
+        """Load the PyTorch model and apply the configured optimizations"""
+        self.model = self._load_pretrained_model()
+        self.model.to(self.device)
+        self.model.eval()
+        logger.info(f"Attention implementation: {self.model.config._attn_implementation}")
+
+        if self.device == "cpu":
+            self._configure_cpu_threads()
+
+        # Dynamic INT8 quantization of the Linear layers for VNNI-accelerated GEMMs on CPU
+        if self.quantize:
+            fp32_ms = self._benchmark_forward()
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+            int8_ms = self._benchmark_forward()
+            logger.info(f"Model quantized to INT8 (forward: fp32 {fp32_ms:.2f}ms -> int8 {int8_ms:.2f}ms)")
+
+        # Compile to cut Python/dispatcher overhead; set CLINICAL_COMPILE=0 to run eager
+        if os.getenv("CLINICAL_COMPILE", "1") == "1":
+            self.model = torch.compile(self.model, mode="reduce-overhead", fullgraph=False)
+            logger.info("Model compiled with torch.compile (mode=reduce-overhead)")
+        elif self.device == "cuda" and os.getenv("CLINICAL_CUDA_GRAPHS", "1") == "1":
+            # reduce-overhead already replays CUDA graphs, so manual capture is only for the eager model
+            self._capture_cuda_graphs()
+
+    def _load_pretrained_model(self):
+        """
+        Load the model with SDPA attention, in FP16 on GPU. The first process writes the weights
+        to CLINICAL_SHM_WEIGHTS and reloads from it; later workers build the model from its config
+        and assign the memory-mapped tensors, so all workers alias one copy of the weights.
+        """
+        # Fused scaled_dot_product_attention; weights loaded directly in FP16 on GPU
+        model_kwargs = {
+            "attn_implementation": "sdpa",
+            "torch_dtype": torch.float16 if self.device == "cuda" else torch.float32,
+        }
+
+        if self.shm_weights_path and os.path.exists(self.shm_weights_path):
+            config = AutoConfig.from_pretrained(self.MODEL_NAME)
+            model = AutoModelForSequenceClassification.from_config(config, **model_kwargs)
+            model.load_state_dict(load_file(self.shm_weights_path), assign=True)
+            logger.info(f"Model weights mapped from shared memory: {self.shm_weights_path}")
+            return model
+
+        model = AutoModelForSequenceClassification.from_pretrained(self.MODEL_NAME, **model_kwargs)
+        if self.shm_weights_path:
+            # Write then rename so concurrently starting workers never read a partial file
+            tmp_path = f"{self.shm_weights_path}.{os.getpid()}.tmp"
+            try:
+                save_file(model.state_dict(), tmp_path)
+                os.replace(tmp_path, self.shm_weights_path)
+            except (OSError, SafetensorError) as e:
+                logger.warning(f"Could not stage model weights in shared memory: {e}")
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+                return model
+
+            # Swap this process's private copy for the mapped file as well
+            model.load_state_dict(load_file(self.shm_weights_path), assign=True)
+            logger.info(f"Model weights staged in shared memory: {self.shm_weights_path}")
+        return model
+
+    def _capture_cuda_graphs(self):
+        """Capture one single-sentence forward pass per sequence bucket into a CUDA graph"""
+        self._cuda_graphs = {}
+        pool = torch.cuda.graph_pool_handle()
+
+        # The SDPA mask helper branches on torch.all(mask == 1), a host sync that cannot be captured and
+        # would bake "no padding" into the graph. Build the additive mask with the plain tensor ops instead
+        # while capturing; the attention layers still run through SDPA and replay never re-enters Python.
+        base_model = self.model.base_model
+        attn_implementation = base_model.attn_implementation
+        base_model.attn_implementation = "eager"
+        try:
+            self._capture_bucket_graphs(pool)
+        finally:
+            base_model.attn_implementation = attn_implementation
+        logger.info(f"Captured CUDA graphs for sequence buckets {self.SEQ_BUCKETS}")
+
+    def _capture_bucket_graphs(self, pool):
+        """Warm up and capture the forward pass for each sequence bucket at batch size 1"""
+        for bucket in self.SEQ_BUCKETS:
+            static_inputs = {
+                name: torch.zeros((1, bucket), dtype=self.GPU_INPUT_DTYPES.get(name, torch.long), device=self.device)
+                for name in self.tokenizer.model_input_names
+            }
+            static_inputs["attention_mask"].fill_(1)
+
+            with torch.inference_mode(), torch.autocast(device_type=self.device, dtype=self.dtype, enabled=self.use_autocast):
+                # Warm up on a side stream so lazy initialization is not captured
+                warmup_stream = torch.cuda.Stream()
+                warmup_stream.wait_stream(torch.cuda.current_stream())
+                with torch.cuda.stream(warmup_stream):
+                    for _ in range(3):
+                        self.model(**static_inputs)
+                torch.cuda.current_stream().wait_stream(warmup_stream)
+
+                graph = torch.cuda.CUDAGraph()
+                with torch.cuda.graph(graph, pool=pool):
+                    static_logits = self.model(**static_inputs).logits
+
+            self._cuda_graphs[bucket] = (graph, static_inputs, static_logits)
+
+    def _load_onnx_model(self):
+        """
+        Export the model to ONNX and serve it with ONNX Runtime, dynamically quantized to INT8 if enabled.
+        The exported model is cached in CLINICAL_ONNX_DIR so later startups skip the export.
+        """
+        try:
+            from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+            from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        except ImportError as e:
+            raise RuntimeError("CLINICAL_BACKEND=onnx requires 'optimum[onnxruntime]' to be installed") from e
+
+        # Keyed on the model name so switching models never serves a stale export
+        model_dir_name = self.MODEL_NAME.strip("/").replace("/", "--")
+        onnx_dir = os.getenv("CLINICAL_ONNX_DIR", os.path.join(tempfile.gettempdir(), "clinical-bert-onnx", model_dir_name))
+        file_name = "model_quantized.onnx" if self.quantize else "model.onnx"
+
+        if not os.path.exists(os.path.join(onnx_dir, file_name)):
+            logger.info(f"Exporting model to ONNX in {onnx_dir}...")
+            os.makedirs(onnx_dir, exist_ok=True)
+            # Export into a private directory, then rename each file into place with the model file last,
+            # so concurrently starting workers never read a partial export
+            export_dir = tempfile.mkdtemp(prefix=f".export-{os.getpid()}-", dir=onnx_dir)
+            try:
+                ort_model = ORTModelForSequenceClassification.from_pretrained(self.MODEL_NAME, export=True)
+                ort_model.save_pretrained(export_dir)
+                if self.quantize:
+                    quantizer = ORTQuantizer.from_pretrained(ort_model)
+                    qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+                    quantizer.quantize(save_dir=export_dir, quantization_config=qconfig)
+                for name in sorted(os.listdir(export_dir), key=lambda name: name == file_name):
+                    os.replace(os.path.join(export_dir, name), os.path.join(onnx_dir, name))
+            finally:
+                shutil.rmtree(export_dir, ignore_errors=True)
+
+        return ORTModelForSequenceClassification.from_pretrained(onnx_dir, file_name=file_name)
+
+    @staticmethod
+    def _configure_cpu_threads():
+        """Use all cores for intra-op parallelism and a single inter-op thread"""
+        torch.set_num_threads(int(os.getenv("TORCH_NUM_THREADS", os.cpu_count() or 1)))
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Can only be set once per process, before any inter-op work has started
+            pass
+        logger.info(f"Torch CPU threads: intra-op={torch.get_num_threads()}, inter-op={torch.get_num_interop_threads()}")
+
+    def _benchmark_forward(self, sentence: str = "The patient denies chest pain.", runs: int = 5) -> float:
+        """Return the mean forward-pass latency in milliseconds for a sample sentence"""
+        inputs = self._tokenize(sentence)
+        with torch.inference_mode():
+            self.model(**inputs)
+            start_time = time.perf_counter()
+            for _ in range(runs):
+                self.model(**inputs)
+        return (time.perf_counter() - start_time) * 1000 / runs
+
+    def _tokenize(self, sentences: Union[str, List[str]]) -> Dict[str, torch.Tensor]:
+        """
+        Tokenize and pad to the smallest sequence bucket that fits the longest input
+
+        Args:
+            sentences: Clinical text or list of texts to tokenize
+
+        Returns:
+            Dictionary of model input tensors on the target device
+        """
+        return self._to_device(self._encode(sentences))
+
+    def _encode(self, sentences: Union[str, List[str]]) -> Dict[str, torch.Tensor]:
+        """Tokenize on the host and pad to the sequence bucket"""
+        inputs = self._tokenize_host(sentences)
+        return self._fit_to_bucket(inputs, self._bucket_for(inputs["input_ids"].shape[1]))
+
+    def _tokenize_host(self, sentences: Union[str, List[str]]) -> Dict[str, torch.Tensor]:
+        """
+        Tokenize on the host, padded to the longest input. Every tokenizer call goes through here:
+        the fast tokenizer rewrites its shared Rust state whenever the padding or truncation settings
+        change, which fails with "Already borrowed" when threads tokenize concurrently.
+        """
+        inputs = self.tokenizer(sentences, return_tensors="pt", truncation=True, max_length=self.MAX_LENGTH, padding="longest")
+        return dict(inputs)
+
+    def _fit_to_bucket(self, inputs: Dict[str, torch.Tensor], bucket: int) -> Dict[str, torch.Tensor]:
+        """Trim trailing padding or pad right so the inputs are exactly one sequence bucket wide"""
+        width = inputs["input_ids"].shape[1]
+        if width > bucket:
+            return {k: v[:, :bucket] for k, v in inputs.items()}
+
+        # Same tensors as padding="max_length" with max_length=bucket, without tokenizing twice
+        if width < bucket:
+            pad_values = {"input_ids": self.tokenizer.pad_token_id}
+            return {k: F.pad(v, (0, bucket - width), value=pad_values.get(k, 0)) for k, v in inputs.items()}
+
+        return inputs
+
+    def _bucket_for(self, length: int) -> int:
+        """Return the smallest sequence bucket that fits a token length"""
+        return next(b for b in self.SEQ_BUCKETS if length <= b)
+
+    def _to_device(self, inputs: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
+        """
+        Move input tensors to the model device. On GPU the host tensors are narrowed
+        to GPU_INPUT_DTYPES, pinned (torch's caching host allocator reuses the pinned
+        blocks) and copied asynchronously on a side stream that the compute stream then waits on.
+        """
+        if self._h2d_stream is None:
+            return {k: v.to(self.device) for k, v in inputs.items()}
+
+        with torch.cuda.stream(self._h2d_stream):
+            device_inputs = {
+                k: v.to(self.GPU_INPUT_DTYPES.get(k, v.dtype)).pin_memory().to(self.device, non_blocking=True)
+                for k, v in inputs.items()
+            }
+
+        compute_stream = torch.cuda.current_stream()
+        compute_stream.wait_stream(self._h2d_stream)
+        for tensor in device_inputs.values():
+            # Allocated on the copy stream but consumed on the compute stream
+            tensor.record_stream(compute_stream)
+        return device_inputs
+
+    def warmup(self):
+        """
+        Run dummy predictions so compilation happens before the first real request.
+        Compiled CUDA graphs are recorded per thread, so call this on every thread that serves predictions.
+        """
+        # One sentence filling each sequence bucket ([CLS] + words + [SEP]), at batch sizes 1 and 2;
+        # bypass the cache so every call reaches the model
+        for bucket in self.SEQ_BUCKETS:
+            sentence = " ".join(["a"] * (bucket - 2))
+            self._run_single(sentence)
+            self._run_batch([sentence, sentence])
+
+    def _forward(self, inputs: Dict[str, torch.Tensor]):
+        """
+        Run the model, falling back to the eager model for good if the compiled graph
+        cannot be built (e.g. for a new input shape)
+        """
+        model = self.model
+        try:
+            return model(**inputs)
+        except (TorchDynamoException, BackendCompilerFailed) as e:
+            # Only compiler errors: runtime failures such as a CUDA OOM propagate and keep the compiled model
+            eager_model = getattr(model, "_orig_mod", None)
+            if eager_model is None:
+                raise
+            outputs = eager_model(**inputs)
+            logger.warning(f"torch.compile failed, falling back to eager model: {e}")
+            self.model = eager_model
+            return outputs
+
+    def clear_cache(self):
+        """Drop all cached predictions"""
+        with self._cache_lock:
+            self._cache.clear()
+
+    @staticmethod
+    def _cache_key(sentence: str) -> bytes:
+        """Fixed-size digest of a sentence, so cached keys do not keep arbitrarily long inputs alive"""
+        return hashlib.blake2b(sentence.encode(), digest_size=16).digest()
+
+    def _cache_get(self, sentence: str) -> Optional[Dict[str, any]]:
+        """Return a copy of the cached prediction for a sentence, or None on a miss"""
+        if not self.cache_size:
+            return None
+        key = self._cache_key(sentence)
+        with self._cache_lock:
+            result = self._cache.get(key)
+            if result is None:
+                return None
+            self._cache.move_to_end(key)
+        return dict(result)
+
+    def _cache_put(self, sentence: str, result: Dict[str, any]):
+        """Store a prediction, evicting the least recently used entry when full"""
+        if not self.cache_size:
+            return
+        key = self._cache_key(sentence)
+        with self._cache_lock:
+            self._cache[key] = dict(result)
+            self._cache.move_to_end(key)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
     def predict(self, sentence: str) -> Dict[str, any]:
         """
         Predict assertion status for a single sentence
@@ -48,27 +403,16 @@ class ClinicalAssertionModel:
         Returns:
             Dictionary with 'label' and 'score'
         """
-        if not self.model or not self.tokenizer:
+        if not self.is_loaded:
             raise RuntimeError("Model not loaded")
 
-        # Tokenize input
-        inputs = self.tokenizer(sentence, return_tensors="pt", truncation=True, max_length=512, padding=True)
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
-
-        # Run inference
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            logits = outputs.logits
-            probs = torch.softmax(logits, dim=-1)
+        cached = self._cache_get(sentence)
+        if cached is not None:
+            return cached
 
-            # Get prediction
-            predicted_class = torch.argmax(probs, dim=-1).item()
-            confidence = probs[0][predicted_class].item()
-
-        # Map class index to label
-        label = self.model.config.id2label[predicted_class]
-
-        return {"label": label, "score": round(confidence, 4)}
+        result = self._run_single(sentence)
+        self._cache_put(sentence, result)
+        return result
 
     def predict_batch(self, sentences: List[str]) -> List[Dict[str, any]]:
         """
@@ -80,31 +424,125 @@ class ClinicalAssertionModel:
         Returns:
             List of dictionaries with 'label' and 'score'
         """
-        if not self.model or not self.tokenizer:
+        if not self.is_loaded:
             raise RuntimeError("Model not loaded")
 
-        # Tokenize all inputs
-        inputs = self.tokenizer(sentences, return_tensors="pt", truncation=True, max_length=512, padding=True)
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        # Serve cache hits directly and run each distinct miss through the model once
+        results = [self._cache_get(sentence) for sentence in sentences]
+        misses = list(dict.fromkeys(sentence for sentence, result in zip(sentences, results) if result is None))
+        if not misses:
+            return results
 
-        # Run inference
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            logits = outputs.logits
-            probs = torch.softmax(logits, dim=-1)
+        computed = dict(zip(misses, self._run_batch(misses)))
+        for sentence, result in computed.items():
+            self._cache_put(sentence, result)
 
-            # Get predictions for all sentences
-            predicted_classes = torch.argmax(probs, dim=-1)
-            confidences = torch.max(probs, dim=-1).values
+        return [result if result is not None else dict(computed[sentence]) for sentence, result in zip(sentences, results)]
 
-        # Format results
-        results = []
-        for pred_class, confidence in zip(predicted_classes, confidences):
-            label = self.model.config.id2label[pred_class.item()]
-            results.append({"label": label, "score": round(confidence.item(), 4)})
+    def _run_single(self, sentence: str) -> Dict[str, any]:
+        """Run one sentence through the model"""
+        if self._cuda_graphs:
+            logits = self._replay_cuda_graph(sentence)
+        else:
+            # Tokenize on the compute stream too, so it waits on the H2D copy and owns the input buffers
+            with self._compute_stream():
+                # Tokenize input
+                inputs = self._tokenize(sentence)
 
+                # Run inference
+                with torch.inference_mode(), torch.autocast(
+                    device_type=self.device, dtype=self.dtype, enabled=self.use_autocast
+                ):
+                    # Single D2H copy, FP32 so post-processing is exact
+                    logits = self._forward(inputs).logits[0].float().cpu()
+
+        # Argmax of logits equals argmax of probs; softmax over a handful of classes is free on CPU
+        predicted_class = int(logits.argmax())
+        confidence = float(torch.softmax(logits, dim=-1)[predicted_class])
+
+        # Map class index to label
+        label = self._id2label[predicted_class]
+
+        return {"label": label, "score": round(confidence, 4)}
+
+    def _replay_cuda_graph(self, sentence: str) -> torch.Tensor:
+        """Copy a sentence into the static inputs of its bucket's CUDA graph, replay it and return the logits row"""
+        inputs = self._encode(sentence)
+        graph, static_inputs, static_logits = self._cuda_graphs[inputs["input_ids"].shape[1]]
+        with self._cuda_graph_lock:
+            for name, static in static_inputs.items():
+                static.copy_(inputs[name].to(static.dtype), non_blocking=True)
+            graph.replay()
+            return static_logits[0].float().cpu()
+
+    def _run_batch(self, sentences: List[str]) -> List[Dict[str, any]]:
+        """
+        Run a list of sentences through the model, one forward pass per sequence bucket,
+        so a single long sentence does not force every other sentence to pad to its length
+        """
+        # Batches of one (e.g. an idle dynamic batcher) can use the captured graphs
+        if len(sentences) == 1 and self._cuda_graphs:
+            return [self._run_single(sentences[0])]
+
+        # Tokenize once; each sentence's unpadded length picks its bucket
+        inputs = self._tokenize_host(sentences)
+        groups = {}
+        for index, length in enumerate(inputs["attention_mask"].sum(-1).tolist()):
+            groups.setdefault(self._bucket_for(length), []).append(index)
+
+        if len(groups) == 1:
+            return self._run_chunk(self._fit_to_bucket(inputs, next(iter(groups))))
+
+        # Fill results back in the original order
+        results = [None] * len(sentences)
+        for bucket, indices in groups.items():
+            rows = torch.tensor(indices)
+            chunk = self._fit_to_bucket({k: v[rows] for k, v in inputs.items()}, bucket)
+            for index, result in zip(indices, self._run_chunk(chunk)):
+                results[index] = result
         return results
 
+    def _run_chunk(self, inputs: Dict[str, torch.Tensor]) -> List[Dict[str, any]]:
+        """Run host-tokenized inputs, padded to one sequence bucket, through the model in one forward pass"""
+        # Everything up to the D2H copy runs on one compute stream
+        with self._compute_stream():
+            # Copy all inputs to the device
+            inputs = self._to_device(inputs)
+
+            # Run inference
+            with torch.inference_mode(), torch.autocast(device_type=self.device, dtype=self.dtype, enabled=self.use_autocast):
+                outputs = self._forward(inputs)
+                # Upcast so post-processing runs in FP32
+                logits = outputs.logits.float()
+
+                # Argmax is invariant under softmax; only the selected class needs a probability,
+                # taken from log_softmax to stay stable for large logits
+                predicted_classes = logits.argmax(dim=-1)
+                confidences = F.log_softmax(logits, dim=-1).gather(-1, predicted_classes.unsqueeze(-1)).squeeze(-1).exp()
+
+            # One D2H copy per tensor instead of an .item() per sentence; waits on this stream only
+            predicted_classes = predicted_classes.tolist()
+            confidences = confidences.tolist()
+
+        # Format results
+        return [
+            {"label": self._id2label[pred_class], "score": round(confidence, 4)}
+            for pred_class, confidence in zip(predicted_classes, confidences)
+        ]
+
+    def _compute_stream(self):
+        """Context that runs the enclosed GPU work on the next stream of the pool (no-op on CPU)"""
+        if not self._compute_streams:
+            return contextlib.nullcontext()
+        with self._compute_stream_lock:
+            stream = next(self._compute_stream_cycle)
+        return torch.cuda.stream(stream)
+
+    @property
+    def max_concurrency(self) -> int:
+        """Number of batches that can usefully run at once"""
+        return len(self._compute_streams) or 1
+
     @property
     def is_loaded(self) -> bool:
         """Check if model is loaded"""
@@ -130,6 +130,40 @@ class TestBatchPredictionEndpoint:
         assert len(data["predictions"]) == 1
         assert data["predictions"][0]["label"] == "ABSENT"
 
+    def test_batch_predict_duplicate_sentences(self):
+        """Test that repeated sentences keep their positions and get identical predictions"""
+        sentences = [
+            "The patient denies chest pain.",
+            "He has a history of hypertension.",
+            "The patient denies chest pain.",
+        ]
+
+        response = client.post("/predict/batch", json={"sentences": sentences})
+
+        assert response.status_code == 200
+        predictions = response.json()["predictions"]
+        assert len(predictions) == len(sentences)
+        assert predictions[0] == predictions[2]
+        assert predictions[0]["label"] == "ABSENT"
+        assert predictions[1]["label"] == "PRESENT"
+
+    def test_batch_predict_mixed_lengths(self):
+        """Test that sentences padded to different sequence buckets come back in their original order"""
+        sentences = [
+            "He has a history of hypertension.",
+            "No signs of pneumonia were observed on the chest radiograph, and the patient denies fever, chills, "
+            "cough, shortness of breath, nausea, vomiting or diarrhea.",
+            "The patient denies chest pain.",
+            "He has a history of hypertension, type 2 diabetes mellitus, hyperlipidemia and chronic kidney disease, "
+            "all managed with medication by his primary care physician.",
+        ]
+
+        response = client.post("/predict/batch", json={"sentences": sentences})
+
+        assert response.status_code == 200
+        predictions = response.json()["predictions"]
+        assert [prediction["label"] for prediction in predictions] == ["PRESENT", "ABSENT", "ABSENT", "PRESENT"]
+
     def test_batch_predict_empty_list(self):
         """Test that empty sentence list returns validation error"""
         response = client.post("/predict/batch", json={"sentences": []})
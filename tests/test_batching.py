@@ -0,0 +1,131 @@
+"""
+Unit tests for the dynamic micro-batcher
+"""
+import asyncio
+import threading
+import pytest
+from app.batching import DynamicBatcher
+
+
+def fake_predict_batch(calls):
+    """Build a predict_batch stand-in that records each batch it receives"""
+
+    def predict_batch(sentences):
+        calls.append(list(sentences))
+        return [{"label": sentence.upper(), "score": 1.0} for sentence in sentences]
+
+    return predict_batch
+
+
+class TestDynamicBatcher:
+    """Tests for request coalescing"""
+
+    def test_concurrent_requests_share_one_batch(self):
+        """Concurrent requests inside the wait window are served by a single model call"""
+        calls = []
+
+        async def run():
+            batcher = DynamicBatcher(fake_predict_batch(calls), max_batch_size=8, max_wait_ms=50)
+            await batcher.start()
+            try:
+                return await asyncio.gather(*(batcher.predict(s) for s in ["a", "b", "c"]))
+            finally:
+                await batcher.stop()
+
+        results = asyncio.run(run())
+        assert [r["label"] for r in results] == ["A", "B", "C"]
+        assert calls == [["a", "b", "c"]]
+
+    def test_batch_size_is_capped(self):
+        """No model call receives more than max_batch_size sentences"""
+        calls = []
+
+        async def run():
+            batcher = DynamicBatcher(fake_predict_batch(calls), max_batch_size=2, max_wait_ms=50)
+            await batcher.start()
+            try:
+                return await asyncio.gather(*(batcher.predict(s) for s in ["a", "b", "c", "d", "e"]))
+            finally:
+                await batcher.stop()
+
+        results = asyncio.run(run())
+        assert [r["label"] for r in results] == ["A", "B", "C", "D", "E"]
+        assert all(len(batch) <= 2 for batch in calls)
+
+    def test_inflight_batches_run_concurrently(self):
+        """With max_inflight=2 a second batch starts while the first is still running"""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def blocking_predict_batch(sentences):
+            # Only passes once two batches are inside the model call at the same time
+            barrier.wait()
+            return [{"label": sentence, "score": 1.0} for sentence in sentences]
+
+        async def run():
+            batcher = DynamicBatcher(blocking_predict_batch, max_batch_size=1, max_wait_ms=1, max_inflight=2)
+            await batcher.start()
+            try:
+                return await asyncio.gather(batcher.predict("a"), batcher.predict("b"))
+            finally:
+                await batcher.stop()
+
+        results = asyncio.run(run())
+        assert [r["label"] for r in results] == ["a", "b"]
+
+    def test_run_uses_executor_thread(self):
+        """run() executes a blocking call on one of the batcher's threads"""
+
+        async def run():
+            batcher = DynamicBatcher(fake_predict_batch([]))
+            await batcher.start()
+            try:
+                return await batcher.run(lambda suffix: threading.current_thread().name + suffix, "!")
+            finally:
+                await batcher.stop()
+
+        name = asyncio.run(run())
+        assert name.startswith("batcher") and name.endswith("!")
+
+    def test_run_on_each_thread_covers_every_executor_thread(self):
+        """run_on_each_thread calls the function once on each of the max_inflight threads"""
+        threads = []
+
+        async def run():
+            batcher = DynamicBatcher(fake_predict_batch([]), max_inflight=3)
+            await batcher.start()
+            try:
+                await batcher.run_on_each_thread(lambda: threads.append(threading.current_thread().name))
+            finally:
+                await batcher.stop()
+
+        asyncio.run(run())
+        assert len(threads) == 3
+        assert len(set(threads)) == 3
+        assert all(name.startswith("batcher") for name in threads)
+
+    def test_model_error_propagates_to_callers(self):
+        """An exception in the model call is raised for every request in the batch"""
+
+        def failing_predict_batch(sentences):
+            raise ValueError("boom")
+
+        async def run():
+            batcher = DynamicBatcher(failing_predict_batch, max_batch_size=8, max_wait_ms=5)
+            await batcher.start()
+            try:
+                await batcher.predict("a")
+            finally:
+                await batcher.stop()
+
+        with pytest.raises(ValueError, match="boom"):
+            asyncio.run(run())
+
+    def test_predict_requires_running_worker(self):
+        """Predicting before start() raises instead of hanging"""
+        batcher = DynamicBatcher(fake_predict_batch([]))
+        with pytest.raises(RuntimeError):
+            asyncio.run(batcher.predict("a"))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,148 @@
+"""
+Unit tests for model loading helpers, run against a tiny randomly initialised BERT
+"""
+import os
+import pytest
+import torch
+from safetensors import SafetensorError
+from torch._dynamo.exc import TorchDynamoException
+from transformers import BertConfig, BertForSequenceClassification
+import app.model
+from app.model import ClinicalAssertionModel
+
+
+@pytest.fixture
+def tiny_model_dir(tmp_path):
+    """Save a two-layer BERT so from_pretrained works without network access"""
+    config = BertConfig(vocab_size=64, hidden_size=32, num_hidden_layers=2, num_attention_heads=2, intermediate_size=64)
+    model_dir = tmp_path / "model"
+    BertForSequenceClassification(config).save_pretrained(model_dir)
+    return str(model_dir)
+
+
+@pytest.fixture
+def make_model(monkeypatch, tiny_model_dir):
+    """Build a ClinicalAssertionModel without loading weights, configured through environment variables"""
+    monkeypatch.setattr(ClinicalAssertionModel, "load_model", lambda self: None)
+    monkeypatch.setattr(ClinicalAssertionModel, "MODEL_NAME", tiny_model_dir)
+
+    def make(**env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        return ClinicalAssertionModel()
+
+    return make
+
+
+class TestSharedMemoryWeights:
+    """Tests for staging weights in a shared file"""
+
+    def test_disabled_by_default_for_one_worker(self, make_model, monkeypatch):
+        """A single worker has nothing to share, so nothing is written"""
+        monkeypatch.delenv("CLINICAL_SHM_WEIGHTS", raising=False)
+        assert make_model(WEB_WORKERS="1").shm_weights_path == ""
+
+    def test_writer_then_reader(self, make_model, tmp_path):
+        """The first process stages the weights; the next one assigns the same tensors from the file"""
+        path = str(tmp_path / "weights.safetensors")
+        writer = make_model(CLINICAL_SHM_WEIGHTS=path)._load_pretrained_model()
+        assert os.path.exists(path)
+        assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+        reader = make_model(CLINICAL_SHM_WEIGHTS=path)._load_pretrained_model()
+        written = writer.state_dict()
+        for name, tensor in reader.state_dict().items():
+            assert torch.equal(tensor, written[name]), name
+
+    def test_failed_write_falls_back(self, make_model, monkeypatch, tmp_path):
+        """A write error keeps the in-memory model and leaves no files behind"""
+
+        def failing_save_file(tensors, filename):
+            open(filename, "wb").close()
+            raise SafetensorError("No space left on device")
+
+        monkeypatch.setattr(app.model, "save_file", failing_save_file)
+        path = str(tmp_path / "weights.safetensors")
+        model = make_model(CLINICAL_SHM_WEIGHTS=path)._load_pretrained_model()
+
+        assert model is not None
+        assert os.listdir(tmp_path) == ["model"]
+
+
+class TestPredictionCache:
+    """Tests for the LRU prediction cache"""
+
+    @pytest.fixture
+    def cached_model(self, make_model, monkeypatch):
+        """Model with a two-entry cache whose forward pass records the sentences it sees"""
+        model = make_model(CLINICAL_CACHE_SIZE="2")
+        model.model = model.tokenizer = object()
+        model.calls = []
+
+        def run_single(sentence):
+            model.calls.append(sentence)
+            return {"label": sentence.upper(), "score": 1.0}
+
+        monkeypatch.setattr(model, "_run_single", run_single)
+        return model
+
+    def test_repeated_sentence_is_served_from_cache(self, cached_model):
+        """A second prediction for the same sentence does not reach the model"""
+        first = cached_model.predict("a")
+        first["label"] = "mutated"
+        assert cached_model.predict("a") == {"label": "A", "score": 1.0}
+        assert cached_model.calls == ["a"]
+
+    def test_least_recently_used_entry_is_evicted(self, cached_model):
+        """Once full, the entry used longest ago is dropped first"""
+        cached_model.predict("a")
+        cached_model.predict("b")
+        cached_model.predict("a")  # "b" is now the least recently used
+        cached_model.predict("c")
+        cached_model.predict("a")
+        cached_model.predict("b")
+        assert cached_model.calls == ["a", "b", "c", "b"]
+
+    def test_keys_are_fixed_size(self, cached_model):
+        """Long sentences are not kept alive as cache keys"""
+        cached_model.predict("x" * 100_000)
+        assert [len(key) for key in cached_model._cache] == [16]
+
+
+class CompiledStub(torch.nn.Module):
+    """Stands in for a torch.compile wrapper whose forward raises a given error"""
+
+    def __init__(self, error):
+        super().__init__()
+        self._orig_mod = torch.nn.Identity()
+        self.error = error
+
+    def forward(self, **inputs):
+        raise self.error
+
+
+class TestCompileFallback:
+    """Tests for falling back to the eager model"""
+
+    def test_compiler_error_switches_to_eager(self, make_model):
+        """A dynamo/inductor failure is retried on the eager model, which is then kept"""
+        model = make_model()
+        model.model = CompiledStub(TorchDynamoException("cannot compile"))
+        eager_model = model.model._orig_mod
+
+        assert model._forward({"input": torch.ones(1)}) == torch.ones(1)
+        assert model.model is eager_model
+
+    def test_runtime_error_keeps_compiled_model(self, make_model):
+        """Other failures, e.g. an out-of-memory error, propagate and keep the compiled model"""
+        model = make_model()
+        compiled = CompiledStub(RuntimeError("CUDA out of memory"))
+        model.model = compiled
+
+        with pytest.raises(RuntimeError, match="out of memory"):
+            model._forward({"input": torch.ones(1)})
+        assert model.model is compiled
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])